@@ -1,38 +1,66 @@
 #!/usr/bin/env python3
 import argparse
+import hashlib
+import importlib.metadata
 import importlib.util
 import json
-import multiprocessing
 import re
 import shutil
-import signal
 import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
-from os import environ, getcwd, getpid, kill, listdir, makedirs, path, remove, getenv
+from os import environ, getcwd, listdir, makedirs, path, remove, getenv, scandir
 from typing import Callable
+from fontTools import version as fonttools_version
 from fontTools.ttLib import TTFont, newTable
 from fontTools.feaLib.builder import addOpenTypeFeatures
+from source.py.cache import BuildCache
+from source.py.dag import Node, close_pools, get_pool, run_dag
 from source.py.utils import (
     check_font_patcher,
     check_directory_hash,
+    get_directory_hash,
     patch_fea_string,
     verify_glyph_width,
     compress_folder,
+    convert_to_woff2,
+    dehint,
+    optimize_otf,
+    remove_overlaps,
+    fix_contours,
+    fast_copy,
     download_cn_base_font,
+    get_cn_base_font_url,
     get_font_forge_bin,
     get_font_name,
     is_ci,
-    is_windows,
     match_unicode_names,
     run,
     set_font_name,
     joinPaths,
+    json_loads,
     merge_ttfonts,
+    prefetch_file,
+    scan_files,
+    NameEditor,
 )
-from source.py.freeze import freeze_feature, get_freeze_config_str
-from source.py.feature import get_freeze_moving_rules
+from source.py.freeze import freeze_feature, get_freeze_config_str, get_freeze_items
+from source.py.feature import generate_fea_string, get_freeze_moving_rules
 
 FONT_VERSION = "v7.1-dev"
+WEIGHTS = (
+    "Thin",
+    "ExtraLight",
+    "Light",
+    "Regular",
+    "Medium",
+    "SemiBold",
+    "Bold",
+    "ExtraBold",
+)
+# compact style names of all static instances
+STYLES = WEIGHTS + tuple("Italic" if w == "Regular" else f"{w}Italic" for w in WEIGHTS)
 # =========================================================================================
 
 
@@ -177,7 +205,7 @@ def parse_args():
     build_group.add_argument(
         "--cache",
         action="store_true",
-        help="Reuse font cache of TTF, OTF and Woff2 formats",
+        help="Reuse font cache of stages whose inputs are unchanged",
     )
     build_group.add_argument(
         "--cn-rebuild",
@@ -203,6 +231,8 @@ class FontConfig:
         self.ttf_only = None
         self.debug = None
         self.apply_fea_file = None
+        # brotli quality of woff2 (0-11), lower is much faster but a little larger
+        self.woff2_quality = 11
         # the number of parallel tasks
         # when run in codespace, this will be 1
         self.pool_size = 1 if not getenv("CODESPACE_NAME") else 4
@@ -302,8 +332,8 @@ class FontConfig:
             config_file_path = (
                 "./source/preset-normal.json" if use_normal else "config.json"
             )
-            with open(config_file_path, "r") as f:
-                data = json.load(f)
+            with open(config_file_path, "rb") as f:
+                data = json_loads(f.read())
                 for prop in [
                     "family_name",
                     "use_hinted",
@@ -334,10 +364,29 @@ class FontConfig:
             print(f"❗ An unexpected error occurred: {e}")
             exit(1)
 
+    # (arg, attribute, key of dict attribute), applied only when the arg is given
+    OPTIONAL_ARGS = (
+        ("hinted", "use_hinted", None),
+        ("liga", "enable_liga", None),
+        ("nerd_font", "nerd_font", "enable"),
+        ("cn", "cn", "enable"),
+    )
+
     def __load_args(self, args):
         self.archive = args.archive
         self.use_cn_both = args.cn_both
         self.debug = args.debug
+        self.woff2_quality = 6 if self.debug else self.woff2_quality
+        quality = getenv("MAPLE_WOFF2_QUALITY")
+        if quality is not None:
+            quality = quality.strip()
+            if quality.isdigit() and int(quality) <= 11:
+                self.woff2_quality = int(quality)
+            else:
+                print(
+                    f"❗ Invalid MAPLE_WOFF2_QUALITY: {quality}, should be 0-11, use 11"
+                )
+                self.woff2_quality = 11
 
         if "font_forge_bin" not in self.nerd_font:
             self.nerd_font["font_forge_bin"] = get_font_forge_bin()
@@ -347,17 +396,14 @@ class FontConfig:
                 if f in self.feature_freeze:
                     self.feature_freeze[f] = "enable"
 
-        if args.hinted is not None:
-            self.use_hinted = args.hinted
-
-        if args.liga is not None:
-            self.enable_liga = args.liga
-
-        if args.nerd_font is not None:
-            self.nerd_font["enable"] = args.nerd_font
-
-        if args.cn is not None:
-            self.cn["enable"] = args.cn
+        for arg, attr, key in FontConfig.OPTIONAL_ARGS:
+            value = getattr(args, arg)
+            if value is None:
+                continue
+            if key is None:
+                setattr(self, attr, value)
+            else:
+                getattr(self, attr)[key] = value
 
         if args.cn_narrow:
             self.cn["narrow"] = True
@@ -380,9 +426,13 @@ class FontConfig:
         self.family_name = " ".join(name_arr)
         self.family_name_compact = "".join(name_arr)
 
+        # validated once and shared as immutable (tag, status) pairs,
+        # tuple instead of MappingProxyType so that it can be sent to pool workers
+        self.freeze_items = get_freeze_items(self.feature_freeze)
         self.freeze_config_str = get_freeze_config_str(
-            self.feature_freeze, self.enable_liga
+            self.freeze_items, self.enable_liga
         )
+        self.nf_version_prefix = f"NF{self.nerd_font['version']};"
 
     def should_build_nf_cn(self) -> bool:
         return self.cn["with_nerd_font"] and self.nerd_font["enable"]
@@ -418,6 +468,7 @@ class BuildOption:
         self.output_variable = joinPaths(self.output_dir, "Variable")
         self.output_woff2 = joinPaths(self.output_dir, "Woff2")
         self.output_nf = joinPaths(self.output_dir, "NF")
+        self.cache_dir = ".cache"
         self.ttf_base_dir = joinPaths(
             self.output_dir, "TTF-AutoHint" if use_hinted else "TTF"
         )
@@ -427,6 +478,7 @@ class BuildOption:
 
         self.cn_suffix = None
         self.cn_suffix_compact = None
+        self.cn_with_nerd_font = False
         self.cn_base_font_dir = ""
         self.output_cn = ""
         # In these subfamilies:
@@ -444,18 +496,45 @@ class BuildOption:
         # same as `ftcli assistant commit . --ls 400 700`
         # https://github.com/ftCLI/FoundryTools-CLI/issues/166#issuecomment-2095756721
         self.base_subfamily_list = ["Regular", "Bold", "Italic", "BoldItalic"]
+        self.style_table = {
+            style: parse_style_name(style, self.base_subfamily_list)
+            for style in STYLES
+        }
         self.is_nf_built = False
         self.is_cn_built = False
-        self.has_cache = (
-            self.__check_file_count(self.output_variable, count=2)
-            and self.__check_file_count(self.output_otf)
-            and self.__check_file_count(self.output_ttf)
-            and self.__check_file_count(self.output_ttf_hinted)
-            and self.__check_file_count(self.output_woff2)
-        )
         self.github_mirror = environ.get("GITHUB", "github.com")
 
+    def has_base_output(
+        self, font_config: FontConfig, target_styles: list[str] | None
+    ) -> bool:
+        """
+        Whether base outputs of target styles exist, only checked when using cache
+        """
+        if not self.__check_file_count(self.output_variable, count=2, end=".ttf"):
+            return False
+        outputs = [(self.output_ttf, "ttf")] + [
+            {
+                "hinted": (self.output_ttf_hinted, "ttf"),
+                "woff2": (self.output_woff2, "woff2"),
+                "otf": (self.output_otf, "otf"),
+            }[fmt]
+            for fmt in get_mono_formats(font_config)
+        ]
+        family_name = font_config.family_name_compact
+        return all(
+            path.exists(joinPaths(dir, f"{family_name}-{style}.{ext}"))
+            for style in target_styles or STYLES
+            for dir, ext in outputs
+        )
+
+    def has_output(self, dir: str) -> bool:
+        if not path.isdir(dir):
+            return False
+        with scandir(dir) as it:
+            return any(True for _ in it)
+
     def load_cn_dir_and_suffix(self, with_nerd_font: bool) -> None:
+        self.cn_with_nerd_font = with_nerd_font
         if with_nerd_font:
             self.cn_base_font_dir = self.output_nf
             self.cn_suffix = "NF CN"
@@ -496,6 +575,29 @@ class BuildOption:
             pool_size=config.pool_size,
         )
 
+    def prefetch_cn_base_font(self, config: FontConfig):
+        """
+        Start downloading CN base font in background, so it is ready when CN build starts
+        """
+        if not config.cn["enable"] and not config.use_cn_both:
+            return
+
+        if is_ci() or config.cn["use_static_base_font"]:
+            if config.cn["clean_cache"] or not path.exists(self.cn_static_dir):
+                zip_path = "cn-base-static.zip"
+            else:
+                return
+        elif not self.__check_file_count(self.cn_variable_dir, 2, "-VF.ttf"):
+            zip_path = "cn-base-variable.zip"
+        else:
+            return
+
+        prefetch_file(
+            get_cn_base_font_url("cn-base", zip_path, self.github_mirror),
+            zip_path,
+            debug=config.debug,
+        )
+
     def __ensure_cn_static_fonts(
         self, clean_cache: bool, use_static: bool, pool_size: int
     ) -> bool:
@@ -509,6 +611,8 @@ class BuildOption:
         tag = "cn-base"
         if is_ci() or use_static:
             zip_path = "cn-base-static.zip"
+            # never extract into hardlinks of cached instances
+            shutil.rmtree(self.cn_static_dir, ignore_errors=True)
             if download_cn_base_font(
                 tag=tag,
                 zip_path=zip_path,
@@ -533,6 +637,7 @@ class BuildOption:
                 cn_variable_dir=self.cn_variable_dir,
                 cn_static_dir=self.cn_static_dir,
                 pool_size=pool_size,
+                force=clean_cache,
             )
             return True
 
@@ -547,6 +652,7 @@ class BuildOption:
                 cn_variable_dir=self.cn_variable_dir,
                 cn_static_dir=self.cn_static_dir,
                 pool_size=pool_size,
+                force=clean_cache,
             )
             return True
 
@@ -566,36 +672,69 @@ class BuildOption:
         return False
 
     def __instantiate_cn_base(
-        self, cn_variable_dir: str, cn_static_dir: str, pool_size: int
+        self,
+        cn_variable_dir: str,
+        cn_static_dir: str,
+        pool_size: int,
+        force: bool = False,
     ):
-        print("=========================================")
-        print("Instantiating CN Base font, be patient...")
-        print("=========================================")
-        run_build(
-            pool_size=pool_size,
-            fn=partial(
-                instantiate_cn_var, base_dir=cn_variable_dir, output_dir=cn_static_dir
-            ),
-            dir=cn_variable_dir,
-        )
-        run_build(
-            pool_size=pool_size,
-            fn=partial(optimize_cn_base, base_dir=cn_static_dir),
-            dir=cn_static_dir,
+        instance_dir = joinPaths(
+            self.cache_dir, "instances", get_cn_instance_key(cn_variable_dir)
         )
+        # always write into new files, they may be hardlinked with cached instances
+        shutil.rmtree(cn_static_dir, ignore_errors=True)
+
+        if not force and self.__check_file_count(instance_dir):
+            print(f"♻️ Reuse cached CN static fonts in {instance_dir}")
+            shutil.copytree(instance_dir, cn_static_dir, copy_function=fast_copy)
+        else:
+            print("=========================================")
+            print("Instantiating CN Base font, be patient...")
+            print("=========================================")
+            run_build(
+                pool_size=pool_size,
+                fn=partial(
+                    instantiate_cn_var,
+                    base_dir=cn_variable_dir,
+                    output_dir=cn_static_dir,
+                ),
+                dir=cn_variable_dir,
+            )
+            run_build(
+                pool_size=pool_size,
+                fn=partial(optimize_cn_base, base_dir=cn_static_dir),
+                dir=cn_static_dir,
+            )
+            # only keep the latest instances
+            shutil.rmtree(path.dirname(instance_dir), ignore_errors=True)
+            shutil.copytree(cn_static_dir, instance_dir, copy_function=fast_copy)
+
         with open(f"{self.cn_static_dir}.sha256", "w") as f:
-            f.write(check_directory_hash(self.cn_static_dir))
+            f.write(get_directory_hash(self.cn_static_dir))
             f.flush()
         print(f"Update {self.cn_static_dir}.sha256")
 
+    def parse_style(self, style_name_compact: str):
+        """
+        Precomputed result of ``parse_style_name``
+        """
+        result = self.style_table.get(style_name_compact)
+        if result is None:
+            result = parse_style_name(style_name_compact, self.base_subfamily_list)
+        return result
+
     def __check_file_count(self, dir: str, count: int = 16, end: str | None = None) -> bool:
-        if not path.isdir(dir):
+        try:
+            with scandir(dir) as it:
+                return sum(1 for e in it if end is None or e.name.endswith(end)) == count
+        except (FileNotFoundError, NotADirectoryError):
             return False
-        return len([f for f in listdir(dir) if end is None or f.endswith(end)]) == count
 
 
 def handle_ligatures(
-    font: TTFont, enable_ligature: bool, freeze_config: dict[str, str]
+    font: TTFont,
+    enable_ligature: bool,
+    freeze_config: tuple[tuple[str, str], ...],
 ):
     """
     whether to enable ligatures and freeze font features
@@ -611,19 +750,35 @@ def handle_ligatures(
 
 def instantiate_cn_var(f: str, base_dir: str, output_dir: str):
     run(
-        f"ftcli converter vf2i -out {output_dir} {joinPaths(base_dir, f)}",
+        ["ftcli", "converter", "vf2i", "-out", output_dir, joinPaths(base_dir, f)],
         log=True,
     )
 
 
+def get_cn_instance_key(cn_variable_dir: str) -> str:
+    """
+    Key of instantiated CN static fonts, from variable fonts and tool versions
+    """
+    hasher = hashlib.sha256()
+    hasher.update(get_directory_hash(cn_variable_dir).encode())
+    hasher.update(fonttools_version.encode())
+    hasher.update(importlib.metadata.version("foundrytools-cli").encode())
+    return hasher.hexdigest()
+
+
 def optimize_cn_base(f: str, base_dir: str):
     font_path = joinPaths(base_dir, f)
     print(f"✨ Optimize {font_path}")
-    run(f"ftcli ttf fix-contours {font_path}")
-    run(f"ftcli ttf remove-overlaps {font_path}")
-    run(
-        f"ftcli utils del-table -t kern -t GPOS {font_path}",
-    )
+    # same as `ftcli ttf fix-contours`, `ftcli ttf remove-overlaps`
+    # and `ftcli utils del-table -t kern -t GPOS`, but load and save only once
+    font = TTFont(font_path, recalcTimestamp=False)
+    fix_contours(font)
+    remove_overlaps(font)
+    for tag in ("kern", "GPOS"):
+        if tag in font:
+            del font[tag]
+    font.save(font_path)
+    font.close()
 
 
 def parse_style_name(style_name_compact: str, skip_subfamily_list: list[str]):
@@ -678,7 +833,21 @@ def parse_style_name(style_name_compact: str, skip_subfamily_list: list[str]):
 
 
 def drop_mac_names(dir: str):
-    run(f"ftcli name del-mac-names -r {dir}")
+    run(["ftcli", "name", "del-mac-names", "-r", dir])
+
+
+# glyphs renamed by FontLab that are not covered by unicode names
+GLYPH_NAME_FIXES = {
+    "uni2047.liga": "question_question.liga",
+    "uni2047.liga.cv62": "question_question.liga.cv62",
+    "dotlessi": "idotless",
+    "f_f": "f_f.liga",
+    "tag_uni061C.liga": "tag_mark.liga",
+    "tag_u1F5C8.liga": "tag_note.liga",
+    "tag_uni26A0.liga": "tag_warning.liga",
+}
+# base name before the first `.` or `_`, and the suffix
+GLYPH_NAME_PREFIX = re.compile(r"([^._]*)(.*)", re.DOTALL)
 
 
 def rename_glyph_name(
@@ -686,45 +855,39 @@ def rename_glyph_name(
     map: dict[str, str],
     post_extra_names: bool = True,
 ):
-    def get_new_name_from_map(old_name: str, map: dict[str, str]):
-        new_name = map.get(old_name)
-        if not new_name:
-            arr = re.split(r"[\._]", old_name, maxsplit=2)
-            name = map.get(arr[0])
-            if name:
-                new_name = name + old_name[len(arr[0]) :]
-        return new_name
-
     print("Rename glyph names")
     glyph_names = font.getGlyphOrder()
     extra_names = font["post"].extraNames
     modified = False
-    merged_map = {
-        **map,
-        **{
-            "uni2047.liga": "question_question.liga",
-            "uni2047.liga.cv62": "question_question.liga.cv62",
-            "dotlessi": "idotless",
-            "f_f": "f_f.liga",
-            "tag_uni061C.liga": "tag_mark.liga",
-            "tag_u1F5C8.liga": "tag_note.liga",
-            "tag_uni26A0.liga": "tag_warning.liga",
-        },
-    }
-
-    for i, _ in enumerate(glyph_names):
-        old_name = str(glyph_names[i])
+    merged_map = {**map, **GLYPH_NAME_FIXES}
+    match_prefix = GLYPH_NAME_PREFIX.match
+    # position of each post extra name, avoid list scan per renamed glyph
+    extra_name_pos = (
+        {n: i for i, n in enumerate(extra_names)} if post_extra_names else {}
+    )
 
-        new_name = get_new_name_from_map(old_name, merged_map)
-        if not new_name or new_name == old_name:
+    for i, old_name in enumerate(glyph_names):
+        new_name = merged_map.get(old_name)
+        if not new_name:
+            # without separator the prefix is the whole name, which is already missed
+            if "." not in old_name and "_" not in old_name:
+                continue
+            prefix, rest = match_prefix(old_name).groups()
+            name = merged_map.get(prefix)
+            if not name:
+                continue
+            new_name = name + rest
+        if new_name == old_name:
             continue
 
         # print(f"[Rename] {old_name} -> {new_name}")
         glyph_names[i] = new_name
         modified = True
 
-        if post_extra_names and old_name in extra_names:
-            extra_names[extra_names.index(old_name)] = new_name
+        idx = extra_name_pos.pop(old_name, None)
+        if idx is not None:
+            extra_names[idx] = new_name
+            extra_name_pos[new_name] = idx
 
     if modified:
         font.setGlyphOrder(glyph_names)
@@ -733,19 +896,19 @@ def rename_glyph_name(
 def get_unique_identifier(
     font_config: FontConfig,
     postscript_name: str,
+    is_nf: bool = False,
     narrow: bool = False,
     ignore_suffix: bool = False,
 ) -> str:
+    """
+    ``narrow`` only applies to CN fonts, callers pass flags of the variant they build
+    """
     if ignore_suffix:
         suffix = ""
     else:
-        suffix = font_config.freeze_config_str
-        if "CN" in postscript_name and narrow:
-            suffix += "Narrow;"
-
-        if "NF" in postscript_name:
-            nf_ver = font_config.nerd_font["version"]
-            suffix = f"NF{nf_ver};{suffix}"
+        nf_prefix = font_config.nf_version_prefix if is_nf else ""
+        narrow_suffix = "Narrow;" if narrow else ""
+        suffix = f"{nf_prefix}{font_config.freeze_config_str}{narrow_suffix}"
 
     beta_str = f"-{font_config.beta}" if font_config.beta else ""
     return f"{font_config.version_str}{beta_str};SUBF;{postscript_name};2024;FL830;{suffix}"
@@ -753,21 +916,27 @@ def get_unique_identifier(
 
 def change_glyph_width(font: TTFont, match_width: int, target_width: int):
     font["hhea"].advanceWidthMax = target_width
-    for name in font.getGlyphOrder():
-        glyph = font["glyf"][name]
-        width, lsb = font["hmtx"][name]
+    glyf = font["glyf"]
+    hmtx = font["hmtx"].metrics
+    delta = round((target_width - match_width) / 2)
+    for name, (width, lsb) in hmtx.items():
         if width != match_width:
             continue
+        glyph = glyf[name]
         if glyph.numberOfContours == 0:
-            font["hmtx"][name] = (target_width, lsb)
+            hmtx[name] = (target_width, lsb)
             continue
 
-        delta = round((target_width - width) / 2)
-        glyph.coordinates.translate((delta, 0))
-        glyph.xMin, glyph.yMin, glyph.xMax, glyph.yMax = (
-            glyph.coordinates.calcIntBounds()
-        )
-        font["hmtx"][name] = (target_width, lsb + delta)
+        # shift all x in one slice assignment, instead of point by point
+        coords = getattr(glyph.coordinates, "_a", None)
+        if coords is not None:
+            coords[0::2] = array(coords.typecode, [x + delta for x in coords[0::2]])
+        else:
+            glyph.coordinates.translate((delta, 0))
+        # bounds move with the integer delta, no need to recalculate from points
+        glyph.xMin += delta
+        glyph.xMax += delta
+        hmtx[name] = (target_width, lsb + delta)
 
 
 def update_font_names(
@@ -782,16 +951,17 @@ def update_font_names(
     preferred_family_name: str | None = None,  # NameID 16
     preferred_style_name: str | None = None,  # NameID 17
 ):
-    set_font_name(font, family_name, 1)
-    set_font_name(font, style_name, 2)
-    set_font_name(font, unique_identifier, 3)
-    set_font_name(font, full_name, 4)
-    set_font_name(font, version_str, 5)
-    set_font_name(font, postscript_name, 6)
+    with NameEditor(font) as names:
+        names.set(1, family_name)
+        names.set(2, style_name)
+        names.set(3, unique_identifier)
+        names.set(4, full_name)
+        names.set(5, version_str)
+        names.set(6, postscript_name)
 
-    if not is_skip_subfamily and preferred_family_name and preferred_style_name:
-        set_font_name(font, preferred_family_name, 16)
-        set_font_name(font, preferred_style_name, 17)
+        if not is_skip_subfamily and preferred_family_name and preferred_style_name:
+            names.set(16, preferred_family_name)
+            names.set(17, preferred_style_name)
 
 
 def add_gasp(font: TTFont):
@@ -801,32 +971,96 @@ def add_gasp(font: TTFont):
     font["gasp"] = gasp
 
 
+def build_variable(input_file: str, font_config: FontConfig, build_option: BuildOption):
+    # glyph outlines are untouched in this stage, skip bounds recalculation
+    font = TTFont(input_file, lazy=True, recalcBBoxes=False)
+    basename = path.basename(input_file)
+    print(f"👉 Variable version for {basename}")
+
+    # fix auto rename by FontLab
+    rename_glyph_name(
+        font=font,
+        map=match_unicode_names(
+            input_file.replace(".ttf", ".glyphs").replace("-VF", ""),
+            build_option.cache_dir,
+        ),
+    )
+
+    is_italic = "Italic" in input_file
+    if font_config.apply_fea_file:
+        fea_path = joinPaths(
+            build_option.src_dir,
+            "features/italic.fea" if is_italic else "features/regular.fea",
+        )
+        print(f"Apply feature file [{fea_path}]")
+        addOpenTypeFeatures(
+            font,
+            fea_path,
+        )
+    else:
+        print("Apply feature string")
+        patch_fea_string(
+            font,
+            is_italic,
+            False,
+        )
+
+    set_font_name(
+        font,
+        get_unique_identifier(
+            font_config=font_config,
+            postscript_name=get_font_name(font, 6),
+            ignore_suffix=True,
+        ),
+        3,
+    )
+
+    verify_glyph_width(
+        font=font,
+        expect_widths=font_config.get_valid_glyph_width_list(),
+        file_name=basename,
+    )
+
+    add_gasp(font)
+
+    target_path = input_file.replace(
+        build_option.src_dir, build_option.output_variable
+    ).replace("-VF", "")
+    font.save(target_path, reorderTables=None)
+
+
+def get_mono_postscript_name(f: str, font_config: FontConfig) -> str:
+    """
+    PostScript name of vf2i instance ``f``, ``build_mono`` saves the font as ``<name>.ttf``
+    """
+    style_compact = f.split("-")[-1].split(".")[0]
+    return f"{font_config.family_name_compact}-{style_compact}"
+
+
 def build_mono(f: str, font_config: FontConfig, build_option: BuildOption):
     print(f"👉 Minimal version for {f}")
     source_path = joinPaths(build_option.output_ttf, f)
 
-    run(f"ftcli fix italic-angle {source_path}")
-    run(f"ftcli fix monospace {source_path}")
-    run(f"ftcli fix strip-names {source_path}")
+    run(["ftcli", "fix", "italic-angle", source_path])
+    run(["ftcli", "fix", "monospace", source_path])
+    run(["ftcli", "fix", "strip-names", source_path])
+
+    font = TTFont(source_path)
 
+    # apply on loaded font to save another load and save
     if font_config.debug:
-        run(f"ftcli ttf dehint {source_path}")
+        dehint(font)
     else:
         # dehint, remove overlap and fix contours
-        run(f"ftcli ttf fix-contours --silent {source_path}")
-
-    font = TTFont(source_path)
+        fix_contours(font)
 
     style_compact = f.split("-")[-1].split(".")[0]
 
     style_with_prefix_space, style_in_2, style_in_17, is_skip_subfamily, _ = (
-        parse_style_name(
-            style_name_compact=style_compact,
-            skip_subfamily_list=build_option.base_subfamily_list,
-        )
+        build_option.parse_style(style_compact)
     )
 
-    postscript_name = f"{font_config.family_name_compact}-{style_compact}"
+    postscript_name = get_mono_postscript_name(f, font_config)
 
     update_font_names(
         font=font,
@@ -853,7 +1087,7 @@ def build_mono(f: str, font_config: FontConfig, build_option: BuildOption):
     handle_ligatures(
         font=font,
         enable_ligature=font_config.enable_liga,
-        freeze_config=font_config.feature_freeze,
+        freeze_config=font_config.freeze_items,
     )
 
     verify_glyph_width(
@@ -867,40 +1101,71 @@ def build_mono(f: str, font_config: FontConfig, build_option: BuildOption):
     font.save(target_path)
     font.close()
 
-    # Autohint version
-    print(f"Auto hint {postscript_name}.ttf")
-    run(f"ftcli ttf autohint {target_path} -out {build_option.output_ttf_hinted}")
 
-    if font_config.ttf_only:
-        return
+def get_mono_formats(font_config: FontConfig) -> list[str]:
+    return ["hinted"] if font_config.ttf_only else ["hinted", "woff2", "otf"]
 
-    # Woff2 version
-    print(f"Convert {postscript_name}.ttf to WOFF2")
-    run(
-        f"ftcli converter ft2wf {target_path} -out {build_option.output_woff2} -f woff2"
-    )
 
-    # OTF version
-    _otf_path = joinPaths(
-        build_option.output_otf, path.basename(target_path).replace(".ttf", ".otf")
-    )
-    print(f"Convert {postscript_name}.ttf to OTF")
-    run(
-        f"ftcli converter ttf2otf --silent {target_path} -out {build_option.output_otf}"
-    )
-    if not font_config.debug:
-        print(f"Optimize {postscript_name}.otf")
-        run(f"ftcli otf fix-contours --silent {_otf_path}")
-        run(f"ftcli otf fix-version {_otf_path}")
+def build_mono_format(
+    job: tuple[str, str], font_config: FontConfig, build_option: BuildOption
+):
+    f, fmt = job
+    # instance file is removed by build_mono, use the renamed one
+    postscript_name = get_mono_postscript_name(f, font_config)
+    target_path = joinPaths(build_option.output_ttf, f"{postscript_name}.ttf")
+
+    if fmt == "hinted":
+        # Autohint version
+        print(f"Auto hint {postscript_name}.ttf")
+        run(
+            [
+                "ftcli",
+                "ttf",
+                "autohint",
+                target_path,
+                "-out",
+                build_option.output_ttf_hinted,
+            ]
+        )
+
+    elif fmt == "woff2":
+        # Woff2 version
+        print(f"Convert {postscript_name}.ttf to WOFF2")
+        convert_to_woff2(
+            target_path, build_option.output_woff2, font_config.woff2_quality
+        )
+
+    elif fmt == "otf":
+        # OTF version
+        _otf_path = joinPaths(build_option.output_otf, f"{postscript_name}.otf")
+        print(f"Convert {postscript_name}.ttf to OTF")
+        run(
+            [
+                "ftcli",
+                "converter",
+                "ttf2otf",
+                "--silent",
+                target_path,
+                "-out",
+                build_option.output_otf,
+            ]
+        )
+        if not font_config.debug:
+            print(f"Optimize {postscript_name}.otf")
+            optimize_otf(_otf_path)
+
+
+def get_nf_base_font_path(font_config: FontConfig, build_option: BuildOption) -> str:
+    prefix = "-Mono" if font_config.nerd_font["mono"] else ""
+    return f"{build_option.src_dir}/MapleMono-NF-Base{prefix}.ttf"
 
 
 def build_nf_by_prebuild_nerd_font(
     font_basename: str, font_config: FontConfig, build_option: BuildOption
 ) -> TTFont:
-    prefix = "-Mono" if font_config.nerd_font["mono"] else ""
     return merge_ttfonts(
         base_font_path=joinPaths(build_option.ttf_base_dir, font_basename),
-        extra_font_path=f"{build_option.src_dir}/MapleMono-NF-Base{prefix}.ttf",
+        extra_font_path=get_nf_base_font_path(font_config, build_option),
     )
 
 
@@ -931,11 +1196,25 @@ def build_nf_by_font_patcher(
     _path = joinPaths(
         build_option.output_nf, font_basename.replace("-", f"{nf_file_name}-")
     )
-    font = TTFont(_path)
+    font = TTFont(_path, recalcBBoxes=False)
     remove(_path)
     return font
 
 
+def get_nf_postscript_name(f: str, font_config: FontConfig) -> str:
+    style_compact_nf = f.split("-")[-1].split(".")[0]
+    return f"{font_config.family_name_compact}-NF-{style_compact_nf}"
+
+
+def get_nf_path(f: str, font_config: FontConfig, build_option: BuildOption) -> str:
+    """
+    Output path of NF font built from base font ``f``
+    """
+    return joinPaths(
+        build_option.output_nf, f"{get_nf_postscript_name(f, font_config)}.ttf"
+    )
+
+
 def build_nf(
     f: str,
     get_ttfont: Callable[[str, FontConfig, BuildOption], TTFont],
@@ -949,13 +1228,10 @@ def build_nf(
     style_compact_nf = f.split("-")[-1].split(".")[0]
 
     style_nf_with_prefix_space, style_in_2, style_in_17, is_skip_sufamily, _ = (
-        parse_style_name(
-            style_name_compact=style_compact_nf,
-            skip_subfamily_list=build_option.base_subfamily_list,
-        )
+        build_option.parse_style(style_compact_nf)
     )
 
-    postscript_name = f"{font_config.family_name_compact}-NF-{style_compact_nf}"
+    postscript_name = get_nf_postscript_name(f, font_config)
 
     update_font_names(
         font=nf_font,
@@ -967,6 +1243,7 @@ def build_nf(
         unique_identifier=get_unique_identifier(
             font_config=font_config,
             postscript_name=postscript_name,
+            is_nf=True,
         ),
         is_skip_subfamily=is_skip_sufamily,
         preferred_family_name=f"{font_config.family_name} NF",
@@ -978,14 +1255,27 @@ def build_nf(
         file_name=postscript_name,
     )
 
-    target_path = joinPaths(
-        build_option.output_nf,
-        f"{postscript_name}.ttf",
-    )
-    nf_font.save(target_path)
+    nf_font.save(get_nf_path(f, font_config, build_option))
     nf_font.close()
 
 
+def get_cn_postscript_name(
+    f: str, font_config: FontConfig, build_option: BuildOption
+) -> str:
+    style_compact_cn = f.split("-")[-1].split(".")[0]
+    return f"{font_config.family_name_compact}-{build_option.cn_suffix_compact}-{style_compact_cn}"
+
+
+def get_cn_path(f: str, font_config: FontConfig, build_option: BuildOption) -> str:
+    """
+    Output path of CN font built from base font ``f``
+    """
+    return joinPaths(
+        build_option.output_cn,
+        f"{get_cn_postscript_name(f, font_config, build_option)}.ttf",
+    )
+
+
 def build_cn(f: str, font_config: FontConfig, build_option: BuildOption):
     style_compact_cn = f.split("-")[-1].split(".")[0]
 
@@ -1004,12 +1294,9 @@ def build_cn(f: str, font_config: FontConfig, build_option: BuildOption):
         style_in_17,
         is_skip_subfamily,
         is_italic,
-    ) = parse_style_name(
-        style_name_compact=style_compact_cn,
-        skip_subfamily_list=build_option.base_subfamily_list,
-    )
+    ) = build_option.parse_style(style_compact_cn)
 
-    postscript_name = f"{font_config.family_name_compact}-{build_option.cn_suffix_compact}-{style_compact_cn}"
+    postscript_name = get_cn_postscript_name(f, font_config, build_option)
 
     update_font_names(
         font=cn_font,
@@ -1021,6 +1308,7 @@ def build_cn(f: str, font_config: FontConfig, build_option: BuildOption):
         unique_identifier=get_unique_identifier(
             font_config=font_config,
             postscript_name=postscript_name,
+            is_nf=build_option.cn_with_nerd_font,
             narrow=font_config.cn["narrow"],
         ),
         is_skip_subfamily=is_skip_subfamily,
@@ -1039,7 +1327,7 @@ def build_cn(f: str, font_config: FontConfig, build_option: BuildOption):
     handle_ligatures(
         font=cn_font,
         enable_ligature=font_config.enable_liga,
-        freeze_config=font_config.feature_freeze,
+        freeze_config=font_config.freeze_items,
     )
 
     if font_config.cn["narrow"]:
@@ -1070,69 +1358,124 @@ def build_cn(f: str, font_config: FontConfig, build_option: BuildOption):
         expect_widths=font_config.get_valid_glyph_width_list(True),
         file_name=postscript_name,
     )
-    target_path = joinPaths(
-        build_option.output_cn,
-        f"{postscript_name}.ttf",
-    )
-    cn_font.save(target_path)
+    cn_font.save(get_cn_path(f, font_config, build_option))
     cn_font.close()
 
 
+def _run_job(fn: Callable, job):
+    fn(job)
+    return job
+
+
+def run_jobs(
+    pool_size: int,
+    fn: Callable,
+    jobs: list,
+    on_done: Callable[[object], None] | None = None,
+):
+    """
+    Run ``fn`` for every job, ``on_done`` is called in main process once a job finishes
+    """
+    if pool_size <= 1:
+        for job in jobs:
+            fn(job)
+            if on_done:
+                on_done(job)
+        return
+
+    pool = get_pool(pool_size)
+    try:
+        for job in pool.imap_unordered(partial(_run_job, fn), jobs, chunksize=1):
+            if on_done:
+                on_done(job)
+    except BaseException:
+        close_pools(terminate=True)
+        raise
+
+
+def get_build_files(dir: str, target_styles: list[str] | None = None) -> list[str]:
+    if not target_styles:
+        return listdir(dir)
+
+    target_set = frozenset(target_styles)
+    files = []
+    with scandir(dir) as it:
+        for entry in it:
+            f = entry.name
+            if f.rpartition("-")[2][:-4] in target_set:
+                files.append(f)
+            elif "NF" not in f:
+                remove(entry.path)
+    return files
+
+
 def run_build(
     pool_size: int, fn: Callable, dir: str, target_styles: list[str] | None = None
 ):
-    def track_pid(processes: list[int], _):
-        pid = getpid()
-        if pid not in processes:
-            processes.append(pid)
-
-    def kill_all(pids: list[int]):
-        for pid in pids:
-            try:
-                kill(pid, signal.SIGTERM)
-            except Exception:
-                try:
-                    if is_windows():
-                        run(f"taskkill.exe /pid {pid}")
-                    else:
-                        kill(pid, signal.SIGKILL)
-                except Exception:
-                    pass
-            pids.remove(pid)
-
-    if target_styles:
-        files = []
-        for f in listdir(dir):
-            if f.split("-")[-1][:-4] in target_styles:
-                files.append(f)
-            elif 'NF' not in f:
-                remove(joinPaths(dir, f))
-    else:
-        files = listdir(dir)
-    pids = []
+    run_jobs(pool_size, fn, get_build_files(dir, target_styles))
 
-    if pool_size <= 1:
-        for f in files:
-            fn(f)
-        return
 
-    with multiprocessing.Pool(processes=pool_size) as pool:
-        try:
-            results = [
-                pool.apply_async(fn, (f,), callback=lambda _: track_pid(pids, _))
-                for f in files
-            ]
+def get_variable_cache_key(
+    cache: BuildCache,
+    input_files: list[str],
+    font_config: FontConfig,
+    build_option: BuildOption,
+) -> str:
+    """
+    Key of preprocessed and fixed variable fonts in ``output_variable``
+    """
+    files = input_files + [
+        f.replace(".ttf", ".glyphs").replace("-VF", "") for f in input_files
+    ]
+    if font_config.apply_fea_file:
+        files += [
+            joinPaths(build_option.src_dir, "features/regular.fea"),
+            joinPaths(build_option.src_dir, "features/italic.fea"),
+        ]
 
-            for r in results:
-                try:
-                    r.get()
-                except BaseException:
-                    kill_all(pids)
-                    raise
+    # build scripts, so that changed build logic will not reuse stale fonts
+    files += ["build.py"] + [
+        entry.path
+        for entry in scan_files(joinPaths(build_option.src_dir, "py"))
+        if entry.name.endswith(".py")
+    ]
 
-        except BaseException:
-            kill_all(pids)
-            raise
+    fea_hasher = hashlib.sha256()
+    for is_italic in [False, True]:
+        fea_hasher.update(generate_fea_string(is_italic, False).encode())
+
+    return cache.compute_key(
+        files=files,
+        extra={
+            "version": FONT_VERSION,
+            "beta": font_config.beta,
+            "fonttools": fonttools_version,
+            "foundrytools_cli": importlib.metadata.version("foundrytools-cli"),
+            "fea": fea_hasher.hexdigest(),
+            "apply_fea_file": font_config.apply_fea_file,
+            "debug": font_config.debug,
+        },
+    )
+
+
+def get_base_cache_key(
+    cache: BuildCache,
+    variable_key: str,
+    font_config: FontConfig,
+    target_styles: list[str] | None,
+) -> str:
+    return cache.compute_key(
+        files=[],
+        extra={
+            "variable": variable_key,
+            "family_name": font_config.family_name,
+            "freeze_config": font_config.freeze_config_str,
+            "debug": font_config.debug,
+            "ttf_only": font_config.ttf_only,
+            "woff2_quality": font_config.woff2_quality,
+            "target_styles": target_styles,
+        },
+    )
 
 
 def main():
@@ -1165,94 +1508,126 @@ def main():
     makedirs(build_option.output_dir, exist_ok=True)
     makedirs(build_option.output_variable, exist_ok=True)
 
+    cache = BuildCache(joinPaths(build_option.cache_dir, "build.db"))
+    if not should_use_cache:
+        cache.clear_stages()
+
     start_time = time.time()
     print("🚩 Start building ...\n")
 
+    if font_config.pool_size > 1:
+        # fork workers before prefetch thread starts, forking a threaded process is unsafe
+        get_pool(font_config.pool_size)
+    build_option.prefetch_cn_base_font(font_config)
+
     # =========================================================================================
     # ===================================   Build basic   =====================================
     # =========================================================================================
 
-    if not should_use_cache or not build_option.has_cache:
-        input_files = [
-            joinPaths(build_option.src_dir, "MapleMono-Italic[wght]-VF.ttf"),
-            joinPaths(build_option.src_dir, "MapleMono[wght]-VF.ttf"),
-        ]
-        for input_file in input_files:
-            font = TTFont(input_file)
-            basename = path.basename(input_file)
-            print(f"👉 Variable version for {basename}")
-
-            # fix auto rename by FontLab
-            rename_glyph_name(
-                font=font,
-                map=match_unicode_names(
-                    input_file.replace(".ttf", ".glyphs").replace("-VF", "")
-                ),
-            )
+    input_files = [
+        joinPaths(build_option.src_dir, "MapleMono-Italic[wght]-VF.ttf"),
+        joinPaths(build_option.src_dir, "MapleMono[wght]-VF.ttf"),
+    ]
+    variable_key = get_variable_cache_key(
+        cache, input_files, font_config, build_option
+    )
+    base_key = get_base_cache_key(cache, variable_key, font_config, target_styles)
 
-            is_italic = "Italic" in input_file
-            if font_config.apply_fea_file:
-                fea_path = joinPaths(
-                    build_option.src_dir,
-                    "features/italic.fea" if is_italic else "features/regular.fea",
-                )
-                print(f"Apply feature file [{fea_path}]")
-                addOpenTypeFeatures(
-                    font,
-                    fea_path,
-                )
-            else:
-                print("Apply feature string")
-                patch_fea_string(
-                    font,
-                    is_italic,
-                    False,
+    if (
+        should_use_cache
+        and build_option.has_base_output(font_config, target_styles)
+        and cache.is_fresh("base", base_key)
+    ):
+        print("♻️ Reuse cache of TTF, OTF and Woff2 formats")
+    else:
+        # untouched copy of variable fonts, output ones lose mac names after instantiation
+        variable_snapshot_dir = joinPaths(build_option.cache_dir, "variable")
+        if (
+            should_use_cache
+            and build_option.has_output(variable_snapshot_dir)
+            and cache.is_fresh("variable", variable_key)
+        ):
+            print("♻️ Reuse cache of variable fonts")
+            for f in listdir(variable_snapshot_dir):
+                shutil.copyfile(
+                    joinPaths(variable_snapshot_dir, f),
+                    joinPaths(build_option.output_variable, f),
                 )
-
-            set_font_name(
-                font,
-                get_unique_identifier(
-                    font_config=font_config,
-                    postscript_name=get_font_name(font, 6),
-                    ignore_suffix=True,
+        else:
+            run_jobs(
+                font_config.pool_size,
+                partial(
+                    build_variable, font_config=font_config, build_option=build_option
                 ),
-                3,
-            )
-
-            verify_glyph_width(
-                font=font,
-                expect_widths=font_config.get_valid_glyph_width_list(),
-                file_name=basename,
+                input_files,
             )
 
-            add_gasp(font)
+            print("\n✨ Instatiate and optimize fonts...\n")
 
-            font.save(
-                input_file.replace(
-                    build_option.src_dir, build_option.output_variable
-                ).replace("-VF", "")
-            )
+            print("Check and optimize variable fonts")
+            if not font_config.debug:
+                run(
+                    ["ftcli", "fix", "decompose-transformed", build_option.output_variable]
+                )
 
-        print("\n✨ Instatiate and optimize fonts...\n")
+            run(["ftcli", "fix", "italic-angle", build_option.output_variable])
+            run(["ftcli", "fix", "monospace", build_option.output_variable])
 
-        print("Check and optimize variable fonts")
-        if not font_config.debug:
-            run(f"ftcli fix decompose-transformed {build_option.output_variable}")
+            shutil.rmtree(variable_snapshot_dir, ignore_errors=True)
+            shutil.copytree(build_option.output_variable, variable_snapshot_dir)
+            cache.update("variable", variable_key)
 
-        run(f"ftcli fix italic-angle {build_option.output_variable}")
-        run(f"ftcli fix monospace {build_option.output_variable}")
         print("Instantiate TTF")
+        # drop fonts of previous build, they are already renamed and processed
+        shutil.rmtree(build_option.output_ttf, ignore_errors=True)
         run(
-            f"ftcli converter vf2i -out {build_option.output_ttf} {build_option.output_variable}"
-        )
-
-        _build_mono = partial(
-            build_mono, font_config=font_config, build_option=build_option
+            [
+                "ftcli",
+                "converter",
+                "vf2i",
+                "-out",
+                build_option.output_ttf,
+                build_option.output_variable,
+            ]
         )
+        # ftcli logs and skips fonts that fail to instantiate
+        instance_count = 0
+        if path.isdir(build_option.output_ttf):
+            instance_count = sum(
+                1 for f in listdir(build_option.output_ttf) if f.endswith(".ttf")
+            )
+        if instance_count != len(STYLES):
+            raise RuntimeError(
+                f"Fail to instantiate variable fonts, expect {len(STYLES)} TTF, "
+                f"got {instance_count}"
+            )
 
-        run_build(
-            font_config.pool_size, _build_mono, build_option.output_ttf, target_styles
-        )
+        # formats of each style start as soon as its minimal version is done,
+        # without waiting for other styles
+        nodes = []
+        for f in get_build_files(build_option.output_ttf, target_styles):
+            nodes.append(
+                Node(
+                    key=f"mono:{f}",
+                    run=partial(
+                        build_mono, f, font_config=font_config, build_option=build_option
+                    ),
+                )
+            )
+            for fmt in get_mono_formats(font_config):
+                nodes.append(
+                    Node(
+                        key=f"{fmt}:{f}",
+                        run=partial(
+                            build_mono_format,
+                            (f, fmt),
+                            font_config=font_config,
+                            build_option=build_option,
+                        ),
+                        deps=[f"mono:{f}"],
+                    )
+                )
+        run_dag(font_config.pool_size, nodes)
 
         drop_mac_names(build_option.output_variable)
         drop_mac_names(build_option.output_ttf)
@@ -1262,35 +1637,75 @@ def main():
             drop_mac_names(build_option.output_otf)
             drop_mac_names(build_option.output_woff2)
 
+        cache.update("base", base_key)
+
     # =========================================================================================
     # ====================================   Build NF   =======================================
     # =========================================================================================
 
+    nf_key = None
     if font_config.nerd_font["enable"]:
         makedirs(build_option.output_nf, exist_ok=True)
         use_font_patcher = build_option.should_use_font_patcher(font_config)
 
-        get_ttfont = (
-            build_nf_by_font_patcher
+        nf_key = cache.compute_key(
+            files=[]
             if use_font_patcher
-            else build_nf_by_prebuild_nerd_font
+            else [get_nf_base_font_path(font_config, build_option)],
+            extra={
+                "base": base_key,
+                "use_hinted": font_config.use_hinted,
+                "use_font_patcher": use_font_patcher,
+                "nerd_font": {
+                    k: v
+                    for k, v in font_config.nerd_font.items()
+                    if k != "font_forge_bin"
+                },
+            },
         )
 
-        _build_fn = partial(
-            build_nf,
-            get_ttfont=get_ttfont,
-            font_config=font_config,
-            build_option=build_option,
-        )
-        _version = font_config.nerd_font["version"]
-        print(
-            f"\n🔧 Patch Nerd-Font v{_version} using {'Font Patcher' if use_font_patcher else 'prebuild base font'}...\n"
-        )
+        if (
+            should_use_cache
+            and build_option.has_output(build_option.output_nf)
+            and cache.is_fresh("nf", nf_key)
+        ):
+            print("\n♻️ Reuse cache of Nerd-Font format")
+        else:
+            get_ttfont = (
+                build_nf_by_font_patcher
+                if use_font_patcher
+                else build_nf_by_prebuild_nerd_font
+            )
 
-        run_build(
-            font_config.pool_size, _build_fn, build_option.output_ttf, target_styles
-        )
-        drop_mac_names(build_option.output_ttf)
+            _build_fn = partial(
+                build_nf,
+                get_ttfont=get_ttfont,
+                font_config=font_config,
+                build_option=build_option,
+            )
+            _version = font_config.nerd_font["version"]
+            print(
+                f"\n🔧 Patch Nerd-Font v{_version} using {'Font Patcher' if use_font_patcher else 'prebuild base font'}...\n"
+            )
+
+            # resume from styles that are built before interruption
+            done = cache.get_done_items("nf", nf_key) if should_use_cache else set()
+            if done:
+                print(f"♻️ Reuse {len(done)} built Nerd-Font styles")
+            run_jobs(
+                font_config.pool_size,
+                _build_fn,
+                [
+                    f
+                    for f in get_build_files(build_option.output_ttf, target_styles)
+                    if f not in done
+                ],
+                on_done=lambda f: cache.mark_done(
+                    "nf", nf_key, f, get_nf_path(f, font_config, build_option)
+                ),
+            )
+            drop_mac_names(build_option.output_ttf)
+            cache.update("nf", nf_key)
         build_option.is_nf_built = True
 
     # =========================================================================================
@@ -1300,21 +1715,56 @@ def main():
     if build_option.should_build_cn(font_config):
 
         def _build_cn():
+            stage = f"cn:{build_option.cn_suffix_compact}"
+            cn_key = cache.compute_key(
+                files=[
+                    joinPaths(build_option.cn_static_dir, f)
+                    for f in listdir(build_option.cn_static_dir)
+                ],
+                extra={
+                    "base": nf_key if font_config.should_build_nf_cn() else base_key,
+                    "cn": font_config.cn,
+                },
+            )
+            if (
+                should_use_cache
+                and build_option.has_output(build_option.output_cn)
+                and cache.is_fresh(stage, cn_key)
+            ):
+                print(f"\n♻️ Reuse cache of {build_option.cn_suffix_compact} format")
+                return
+
             print(
                 f"\n🔎 Build CN fonts {'with Nerd-Font' if font_config.should_build_nf_cn() else ''}...\n"
             )
             makedirs(build_option.output_cn, exist_ok=True)
             fn = partial(build_cn, font_config=font_config, build_option=build_option)
 
-            run_build(
-                font_config.pool_size, fn, build_option.cn_base_font_dir, target_styles
+            # resume from styles that are built before interruption
+            done = cache.get_done_items(stage, cn_key) if should_use_cache else set()
+            if done:
+                print(f"♻️ Reuse {len(done)} built {build_option.cn_suffix_compact} styles")
+            run_jobs(
+                font_config.pool_size,
+                fn,
+                [
+                    f
+                    for f in get_build_files(
+                        build_option.cn_base_font_dir, target_styles
+                    )
+                    if f not in done
+                ],
+                on_done=lambda f: cache.mark_done(
+                    stage, cn_key, f, get_cn_path(f, font_config, build_option)
+                ),
             )
 
             if font_config.cn["use_hinted"]:
                 print("Auto hinting all glyphs")
-                run(f"ftcli ttf autohint {build_option.output_cn}")
+                run(["ftcli", "ttf", "autohint", build_option.output_cn])
 
             drop_mac_names(build_option.cn_base_font_dir)
+            cache.update(stage, cn_key)
 
         _build_cn()
 
@@ -1324,30 +1774,29 @@ def main():
 
         build_option.is_cn_built = True
 
+    cache.close()
+
     # =========================================================================================
     # ==================================   Write Config   =====================================
     # =========================================================================================
-    with open(
-        joinPaths(build_option.output_dir, "build-config.json"), "w", encoding="utf-8"
-    ) as config_file:
-        result = {
-            "version": FONT_VERSION,
-            "family_name": font_config.family_name,
-            "use_hinted": font_config.use_hinted,
-            "ligature": font_config.enable_liga,
-            "feature_freeze": font_config.feature_freeze,
-            "nerd_font": font_config.nerd_font,
-            "cn": font_config.cn,
-        }
-        del result["nerd_font"]["font_forge_bin"]
-        del result["nerd_font"]["enable"]
-        del result["cn"]["enable"]
-        config_file.write(
-            json.dumps(
-                result,
-                indent=4,
-            )
-        )
+    result = {
+        "version": FONT_VERSION,
+        "family_name": font_config.family_name,
+        "use_hinted": font_config.use_hinted,
+        "ligature": font_config.enable_liga,
+        "feature_freeze": font_config.feature_freeze,
+        # filtered copies, do not mutate font config
+        "nerd_font": {
+            k: v
+            for k, v in font_config.nerd_font.items()
+            if k not in ("font_forge_bin", "enable")
+        },
+        "cn": {k: v for k, v in font_config.cn.items() if k != "enable"},
+    }
+    # serialized once, and reused by every archive
+    build_config = json.dumps(result, indent=4).encode("utf-8")
+    with open(joinPaths(build_option.output_dir, "build-config.json"), "wb") as f:
+        f.write(build_config)
 
     # =========================================================================================
     # ====================================   archive   ========================================
@@ -1356,35 +1805,43 @@ def main():
         print("\n🚀 archive files...\n")
 
         # archive fonts
+        output_dir = build_option.output_dir
         archive_dir_name = "archive"
-        archive_dir = joinPaths(build_option.output_dir, archive_dir_name)
+        archive_dir = joinPaths(output_dir, archive_dir_name)
         makedirs(archive_dir, exist_ok=True)
+        archive_suffix = "-unhinted" if not font_config.use_hinted else ""
 
         # archive fonts
-        for f in listdir(build_option.output_dir):
-            if f == archive_dir_name or f.endswith(".json"):
-                continue
-
-            if should_use_cache and f not in ["CN", "NF", "NF-CN"]:
-                continue
+        folders = [
+            f
+            for f in listdir(output_dir)
+            if f != archive_dir_name
+            and not f.endswith(".json")
+            and not (should_use_cache and f not in ["CN", "NF", "NF-CN"])
+        ]
 
-            sha256, zip_file_name_without_ext = compress_folder(
+        def _archive(f: str) -> tuple[str, str]:
+            return compress_folder(
                 family_name_compact=font_config.family_name_compact,
-                suffix="-unhinted" if not font_config.use_hinted else "",
-                source_file_or_dir_path=joinPaths(build_option.output_dir, f),
-                build_config_path=joinPaths(
-                    build_option.output_dir, "build-config.json"
-                ),
+                suffix=archive_suffix,
+                source_file_or_dir_path=joinPaths(output_dir, f),
+                build_config=build_config,
                 target_parent_dir_path=archive_dir,
             )
-            with open(
-                joinPaths(archive_dir, f"{zip_file_name_without_ext}.sha256"),
-                "w",
-                encoding="utf-8",
-            ) as hash_file:
-                hash_file.write(sha256)
 
-            print(f"👉 archive: {f}")
+        # zlib releases the GIL, so archives can be compressed in parallel threads
+        with ThreadPoolExecutor() as executor:
+            for f, (sha256, zip_file_name_without_ext) in zip(
+                folders, executor.map(_archive, folders)
+            ):
+                with open(
+                    joinPaths(archive_dir, f"{zip_file_name_without_ext}.sha256"),
+                    "w",
+                    encoding="utf-8",
+                ) as hash_file:
+                    hash_file.write(sha256)
+
+                print(f"👉 archive: {f}")
 
     # =========================================================================================
     # =====================================   Finish   ========================================
@@ -1407,4 +1864,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        close_pools()
@@ -0,0 +1,130 @@
+import hashlib
+import sqlite3
+import time
+from os import makedirs, path, stat
+from source.py.utils import hash_file, json_dumps, json_loads
+
+
+class BuildCache:
+    """
+    Content-addressed index of build stages, backed by sqlite.
+
+    Each stage records the key (SHA-256 of its inputs) it was last built from,
+    so it can be skipped while its inputs stay unchanged.
+    """
+
+    def __init__(self, db_path: str):
+        parent = path.dirname(db_path)
+        if parent:
+            makedirs(parent, exist_ok=True)
+        self.db = sqlite3.connect(db_path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS stage (name TEXT PRIMARY KEY, key TEXT NOT NULL, mtime REAL NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS file (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS item (stage TEXT NOT NULL, name TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (stage, name))"
+        )
+        try:
+            # inputs of the key, to explain why a stage is stale
+            self.db.execute("ALTER TABLE stage ADD COLUMN inputs TEXT")
+        except sqlite3.OperationalError:
+            pass
+        try:
+            # output file of item, item is not done once it is deleted
+            self.db.execute("ALTER TABLE item ADD COLUMN output TEXT")
+        except sqlite3.OperationalError:
+            pass
+        self.db.commit()
+        self.inputs: dict[str, dict] = {}
+
+    def file_hash(self, file_path: str) -> str:
+        """
+        SHA-256 of file content, reuse recorded digest if size and mtime are unchanged
+        """
+        st = stat(file_path)
+        row = self.db.execute(
+            "SELECT size, mtime_ns, sha256 FROM file WHERE path = ?", (file_path,)
+        ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+
+        digest = hash_file(file_path).hexdigest()
+
+        self.db.execute(
+            "INSERT OR REPLACE INTO file VALUES (?, ?, ?, ?)",
+            (file_path, st.st_size, st.st_mtime_ns, digest),
+        )
+        self.db.commit()
+        return digest
+
+    def compute_key(self, files: list[str], extra: dict) -> str:
+        inputs = {
+            **{f"file:{f}": self.file_hash(f) for f in files},
+            **extra,
+        }
+        key = hashlib.sha256(json_dumps(inputs, sort_keys=True)).hexdigest()
+        self.inputs[key] = inputs
+        return key
+
+    def is_fresh(self, stage: str, key: str) -> bool:
+        row = self.db.execute(
+            "SELECT key, inputs FROM stage WHERE name = ?", (stage,)
+        ).fetchone()
+        if row is None:
+            return False
+        if row[0] == key:
+            return True
+
+        # evict stale record and log what changed
+        self.db.execute("DELETE FROM stage WHERE name = ?", (stage,))
+        self.db.commit()
+        old_inputs = json_loads(row[1]) if row[1] else {}
+        new_inputs = self.inputs.get(key, {})
+        changed = sorted(
+            k
+            for k in old_inputs.keys() | new_inputs.keys()
+            if old_inputs.get(k) != new_inputs.get(k)
+        )
+        print(f"🔄 Cache of [{stage}] is stale, changed: {', '.join(changed) or 'unknown'}")
+        return False
+
+    def update(self, stage: str, key: str):
+        inputs = self.inputs.get(key)
+        self.db.execute(
+            "INSERT OR REPLACE INTO stage (name, key, mtime, inputs) VALUES (?, ?, ?, ?)",
+            (
+                stage,
+                key,
+                time.time(),
+                json_dumps(inputs).decode() if inputs is not None else None,
+            ),
+        )
+        self.db.commit()
+
+    def get_done_items(self, stage: str, key: str) -> set[str]:
+        """
+        Items (e.g. font files) of an unfinished stage that are already built with ``key``,
+        and whose recorded output file still exists
+        """
+        rows = self.db.execute(
+            "SELECT name, output FROM item WHERE stage = ? AND key = ?", (stage, key)
+        ).fetchall()
+        return {name for name, output in rows if output and path.exists(output)}
+
+    def mark_done(self, stage: str, key: str, name: str, output: str):
+        self.db.execute(
+            "INSERT OR REPLACE INTO item (stage, name, key, output) VALUES (?, ?, ?, ?)",
+            (stage, name, key, output),
+        )
+        self.db.commit()
+
+    def clear_stages(self):
+        self.db.execute("DELETE FROM stage")
+        self.db.execute("DELETE FROM item")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
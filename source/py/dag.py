@@ -0,0 +1,109 @@
+import multiprocessing
+import signal
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing.pool import Pool
+from queue import Queue
+from typing import Callable
+
+
+@dataclass
+class Node:
+    """
+    Build step, ``run`` must be picklable (e.g. ``functools.partial`` of module function)
+    """
+
+    key: str
+    run: Callable[[], object]
+    deps: list[str] = field(default_factory=list)
+
+
+def _ignore_sigint():
+    # let the main process handle Ctrl-C and terminate the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+__pools: dict[int, Pool] = {}
+
+
+def get_pool(pool_size: int) -> Pool:
+    """
+    Long-lived worker pool shared by all build stages, so workers are only started once
+    """
+    pool = __pools.get(pool_size)
+    if pool is None:
+        pool = multiprocessing.Pool(processes=pool_size, initializer=_ignore_sigint)
+        __pools[pool_size] = pool
+    return pool
+
+
+def close_pools(terminate: bool = False):
+    for pool in __pools.values():
+        if terminate:
+            pool.terminate()
+        else:
+            pool.close()
+        pool.join()
+    __pools.clear()
+
+
+def _sort_nodes(nodes: list[Node]) -> tuple[dict[str, int], dict[str, list[str]]]:
+    keys = {node.key for node in nodes}
+    pending = {node.key: len(node.deps) for node in nodes}
+    dependents: dict[str, list[str]] = {node.key: [] for node in nodes}
+    for node in nodes:
+        for dep in node.deps:
+            if dep not in keys:
+                raise ValueError(f"Unknown dependency {dep} of {node.key}")
+            dependents[dep].append(node.key)
+    return pending, dependents
+
+
+def run_dag(pool_size: int, nodes: list[Node]):
+    """
+    Run nodes in dependency order, every node starts as soon as all its deps are done
+    """
+    node_dict = {node.key: node for node in nodes}
+    pending, dependents = _sort_nodes(nodes)
+    ready = deque(node.key for node in nodes if pending[node.key] == 0)
+    finished = 0
+
+    def _finish(key: str):
+        nonlocal finished
+        finished += 1
+        for dependent in dependents[key]:
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                ready.append(dependent)
+
+    if pool_size <= 1:
+        while ready:
+            key = ready.popleft()
+            node_dict[key].run()
+            _finish(key)
+    else:
+        done: Queue[tuple[str, BaseException | None]] = Queue()
+        pool = get_pool(pool_size)
+        try:
+            running = 0
+            while ready or running:
+                while ready:
+                    key = ready.popleft()
+                    pool.apply_async(
+                        node_dict[key].run,
+                        callback=lambda _, key=key: done.put((key, None)),
+                        error_callback=lambda e, key=key: done.put((key, e)),
+                    )
+                    running += 1
+
+                key, error = done.get()
+                running -= 1
+                if error is not None:
+                    raise error
+                _finish(key)
+        except BaseException:
+            close_pools(terminate=True)
+            raise
+
+    if finished != len(nodes):
+        raise ValueError("Circular dependencies in build nodes")
@@ -1,4 +1,5 @@
 import json
+from functools import lru_cache
 from source.py.feature import ast
 from source.py.feature.base import get_base_feature_cn_only
 from source.py.feature.calt import get_calt_lookup
@@ -20,17 +21,15 @@ from source.py.feature.italic import (
 from source.py.feature.cv import cv96, cv97, cv98, cv99
 
 
+# indexed by [italic][cn]
+__fea_table = (
+    (feature_file_regular, feature_file_regular_cn),
+    (feature_file_italic, feature_file_italic_cn),
+)
+
+
 def generate_fea_string(italic: bool, cn: bool):
-    if italic:
-        if cn:
-            return feature_file_italic_cn
-        else:
-            return feature_file_italic
-    else:
-        if cn:
-            return feature_file_regular_cn
-        else:
-            return feature_file_regular
+    return __fea_table[bool(italic)][bool(cn)]
 
 
 def generate_fea_string_cn_only():
@@ -45,6 +44,7 @@ def generate_fea_string_cn_only():
     )
 
 
+@lru_cache(maxsize=None)
 def get_all_calt_text():
     result = []
 
@@ -72,49 +72,64 @@ def get_version_info(
     return result
 
 
+@lru_cache(maxsize=None)
 def get_cv_desc():
     return "\n".join(
         [cv.desc_item() for cv in cv_list_regular] + [f"- [v7.0] zero: {zero_desc}"]
     )
 
 
+@lru_cache(maxsize=None)
 def get_cv_version_info() -> dict[str, dict[str, str]]:
     return get_version_info(cv_list_regular)
 
 
+# italic only variants, cv31 ~ cv60
+__cv_list_italic_only = [cv for cv in cv_list_italic if 30 < cv.id < 61]
+
+
+@lru_cache(maxsize=None)
 def get_cv_italic_desc():
-    return "\n".join(
-        [cv.desc_item() for cv in cv_list_italic if cv.id > 30 and cv.id < 61]
-    )
+    return "\n".join([cv.desc_item() for cv in __cv_list_italic_only])
 
+
+@lru_cache(maxsize=None)
 def get_cv_italic_version_info() -> dict[str, dict[str, str]]:
-    return get_version_info([cv for cv in cv_list_italic if cv.id > 30 and cv.id < 61])
+    return get_version_info(__cv_list_italic_only)
 
 
+@lru_cache(maxsize=None)
 def get_cv_cn_desc():
     return "\n".join([cv.desc_item() for cv in cv_list_cn])
 
 
+@lru_cache(maxsize=None)
 def get_cv_cn_version_info() -> dict[str, dict[str, str]]:
     return get_version_info(cv_list_cn)
 
+
+# first stylistic set of each id, and last of each tag
+__ss_by_id = {ss.id: ss for ss in reversed(ss_list_regular + ss_list_italic)}
+__ss_by_tag = {ss.tag: ss for ss in ss_list_regular + ss_list_italic}
+
+
+@lru_cache(maxsize=None)
 def get_ss_desc():
-    result = {}
-    for ss in ss_list_regular + ss_list_italic:
-        if ss.id not in result:
-            desc = ss.desc_item()
+    result = []
+    for ss in __ss_by_id.values():
+        desc = ss.desc_item()
 
-            if ss.id == 5:
-                desc = desc.replace("`\\\\`", "`\\\\\\\\`")
+        if ss.id == 5:
+            desc = desc.replace("`\\\\`", "`\\\\\\\\`")
 
-            result[ss.id] = desc
+        result.append(desc)
 
-    return "\n".join(sorted(result.values()))
+    return "\n".join(sorted(result))
 
 
+@lru_cache(maxsize=None)
 def get_ss_version_info() -> dict[str, dict[str, str]]:
-    ss = list({s.tag: s for s in ss_list_regular + ss_list_italic}.values())
-    return get_version_info(sorted(ss, key=lambda x: x.tag))
+    return get_version_info(sorted(__ss_by_tag.values(), key=lambda x: x.tag))
 
 
 __total_feat_list = (
@@ -122,6 +137,7 @@ __total_feat_list = (
 )
 
 
+@lru_cache(maxsize=None)
 def get_total_feat_dict() -> dict[str, str]:
     result = {}
 
@@ -134,6 +150,7 @@ def get_total_feat_dict() -> dict[str, str]:
     return dict(sorted(result.items()))
 
 
+@lru_cache(maxsize=None)
 def get_total_feat_ts() -> str:
     feat_dict = {}
 
@@ -160,11 +177,12 @@ export const featureArray = {json.dumps(list(feat_dict.keys()), indent=2)}
 """
 
 
-def get_freeze_moving_rules() -> list[str]:
+@lru_cache(maxsize=None)
+def get_freeze_moving_rules() -> frozenset[str]:
     result = set()
 
     for feat in __total_feat_list:
         if feat.has_lookup:
             result.add(feat.tag)
 
-    return list(result)
+    return frozenset(result)
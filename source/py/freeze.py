@@ -1,3 +1,6 @@
+from functools import lru_cache
+
+
 def is_enable(v):
     return v.upper().startswith("ENABLE")
 
@@ -10,11 +13,27 @@ def is_ignore(v):
     return v.upper().startswith("IGNORE")
 
 
-def get_freeze_config_str(feature_freeze, enable_liga):
+def _to_hashable(v):
+    if isinstance(v, dict):
+        return tuple((k, _to_hashable(item)) for k, item in v.items())
+    if isinstance(v, list):
+        return tuple(_to_hashable(item) for item in v)
+    return v
+
+
+def get_freeze_items(feature_freeze: dict) -> tuple[tuple[str, str], ...]:
+    """
+    Hashable ``(tag, status)`` pairs of freeze config, invalid values are kept for validation
+    """
+    return tuple((k, _to_hashable(v)) for k, v in feature_freeze.items())
+
+
+@lru_cache(maxsize=None)
+def get_freeze_config_str(feature_freeze: tuple[tuple[str, str], ...], enable_liga):
     invalid_items = []
 
     result = ""
-    for k, v in feature_freeze.items():
+    for k, v in feature_freeze:
         if isinstance(v, str):
             if is_enable(v):
                 result += f"+{k};"
@@ -34,7 +53,36 @@ def get_freeze_config_str(feature_freeze, enable_liga):
     return result
 
 
-def freeze_feature(font, calt, moving_rules=[], config={}):
+@lru_cache(maxsize=None)
+def get_freeze_plan(
+    config: tuple[tuple[str, str], ...], moving_rules: frozenset[str], calt: bool
+) -> tuple[tuple[str, str], ...]:
+    """
+    Resolve freeze config into ``(tag, action)`` pairs,
+    action is one of ``"disable"``, ``"move"`` and ``"replace"``
+    """
+    result = []
+    for tag, status in config:
+        if is_ignore(status):
+            continue
+        if is_disable(status):
+            result.append((tag, "disable"))
+        elif tag in moving_rules and calt:
+            result.append((tag, "move"))
+        else:
+            result.append((tag, "replace"))
+    return tuple(result)
+
+
+def freeze_feature(font, calt, moving_rules=frozenset(), config=()):
+    """
+    ``config`` is ``(tag, status)`` pairs, e.g. ``FontConfig.freeze_items``
+    """
+    plan = get_freeze_plan(tuple(config), frozenset(moving_rules), calt)
+    # nothing to freeze, skip decompiling GSUB
+    if calt and not plan:
+        return
+
     # check feature list
     feature_record = font["GSUB"].table.FeatureList.FeatureRecord
     feature_dict = {
@@ -58,16 +106,16 @@ def freeze_feature(font, calt, moving_rules=[], config={}):
                 feature.FeatureTag = "DELT"
 
     # Process features
-    for tag, status in config.items():
+    for tag, action in plan:
         target_feature = feature_dict.get(tag)
-        if not target_feature or is_ignore(status):
+        if not target_feature:
             continue
 
-        if is_disable(status):
+        if action == "disable":
             target_feature.LookupListIndex = []
             continue
 
-        if tag in moving_rules and calt:
+        if action == "move":
             # Enable by moving rules into "calt"
             for calt_feat in calt_features:
                 calt_feat.LookupListIndex.extend(target_feature.LookupListIndex)
@@ -99,7 +99,7 @@ def format_font_map_key(key: int) -> str:
 
 
 def write_unicode_map_json(font_path: str, output: str):
-    font = TTFont(font_path)
+    font = TTFont(font_path, lazy=True)
     font_map = {
         format_font_map_key(k): v
         for k, v in font.getBestCmap().items()
@@ -1,16 +1,45 @@
 import hashlib
-from os import environ, path, remove, walk
+from concurrent.futures import ThreadPoolExecutor
+import mmap
+import pickle
+from functools import lru_cache
+from io import StringIO
+from os import DirEntry, environ, fstat, link, makedirs, path, remove, replace, scandir
 import sys
 import shutil
 import subprocess
+from threading import Thread
 from urllib.request import Request, urlopen
 from zipfile import ZIP_DEFLATED, ZipFile
 from fontTools.ttLib import TTFont
-from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.ttLib.tables._n_a_m_e import NameRecord, makeName
+from fontTools.feaLib.builder import addOpenTypeFeatures
+from fontTools.feaLib.parser import Parser
 from glyphsLib import GSFont
 
 from source.py.feature import generate_fea_string
 
+try:
+    import orjson
+
+    def json_loads(data: bytes):
+        return orjson.loads(data)
+
+    def json_dumps(obj, sort_keys: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+
+except ImportError:
+    import json
+
+    def json_loads(data: bytes):
+        return json.loads(data)
+
+    def json_dumps(obj, sort_keys: bool = False) -> bytes:
+        # same output as orjson
+        return json.dumps(
+            obj, sort_keys=sort_keys, ensure_ascii=False, separators=(",", ":")
+        ).encode()
+
 
 def is_ci():
     ci_envs = [
@@ -29,6 +58,38 @@ def is_ci():
     return False
 
 
+def run_ftcli(args: list[str], log: bool) -> bool:
+    """
+    Run ``ftcli`` command in current process, skip interpreter startup and
+    module imports of a new process. Return ``False`` if FoundryTools-CLI is not importable
+    """
+    try:
+        import click
+        from foundryToolsCLI.__main__ import main
+        from loguru import logger
+    except ImportError:
+        return False
+
+    command = f"ftcli {' '.join(args)}"
+    if not log:
+        logger.disable("foundryToolsCLI")
+    try:
+        code = main.main(args=args, prog_name="ftcli", standalone_mode=False)
+    except click.exceptions.Exit as e:
+        code = e.exit_code
+    except click.ClickException as e:
+        # click exceptions can not be pickled back from pool workers
+        raise RuntimeError(f"{command} failed: {e.format_message()}") from None
+    except click.exceptions.Abort:
+        raise RuntimeError(f"{command} aborted") from None
+    finally:
+        if not log:
+            logger.enable("foundryToolsCLI")
+    if isinstance(code, int) and code != 0:
+        raise RuntimeError(f"{command} failed with exit code {code}")
+    return True
+
+
 def run(command, extra_args=None, log=not is_ci()):
     """
     Run a command line interface (CLI) command.
@@ -37,13 +98,62 @@ def run(command, extra_args=None, log=not is_ci()):
         extra_args = []
     if isinstance(command, str):
         command = command.split()
+    command = command + extra_args
+    if command[0] == "ftcli" and run_ftcli(command[1:], log):
+        return
     subprocess.run(
-        command + extra_args,
+        command,
         stdout=subprocess.DEVNULL if not log else None,
         check=True,
     )
 
 
+def fix_contours(font: TTFont):
+    """
+    Same as `ftcli ttf fix-contours --silent`, on loaded font:
+    dehint, remove overlaps and fix contours
+    """
+    from foundryToolsCLI.Lib.utils.ttf_tools import correct_ttf_contours
+
+    correct_ttf_contours(font, min_area=25, remove_hinting=True, verbose=False)
+
+
+def remove_overlaps(font: TTFont):
+    """
+    Same as `ftcli ttf remove-overlaps`, on loaded font
+    """
+    from fontTools.ttLib.removeOverlaps import removeOverlaps
+
+    # unlike ftcli, keep glyphs that skia-pathops fails on as is instead of aborting the build
+    removeOverlaps(font=font, removeHinting=True, ignoreErrors=True)
+
+
+def dehint(font: TTFont):
+    """
+    Same as `ftcli ttf dehint`, on loaded font
+    """
+    from dehinter.font import dehint as _dehint
+
+    _dehint(tt=font, verbose=False)
+
+
+def optimize_otf(otf_path: str):
+    """
+    Same as `ftcli otf fix-contours --silent` and `ftcli otf fix-version`,
+    but load and save the font only once
+    """
+    from foundryToolsCLI.Lib.Font import Font
+
+    font = Font(otf_path, recalcTimestamp=False)
+    try:
+        font.otf_fix_contours(min_area=25, verbose=False)
+        font.otf_subroutinize()
+        font.fix_cff_top_dict_version()
+        font.save(otf_path)
+    finally:
+        font.close()
+
+
 def set_font_name(font: TTFont, name: str, id: int):
     font["name"].setName(name, nameID=id, platformID=1, platEncID=0, langID=0x0)
     font["name"].setName(name, nameID=id, platformID=3, platEncID=1, langID=0x409)
@@ -61,6 +171,39 @@ def del_font_name(font: TTFont, id: int):
     font["name"].removeNames(nameID=id)
 
 
+class NameEditor:
+    """
+    Batch edit name table in one pass, records are indexed by
+    ``(nameID, platformID, platEncID, langID)`` and written back on exit
+
+    with NameEditor(font) as names:
+        names.set(1, "Maple Mono")
+    """
+
+    def __init__(self, font: TTFont):
+        self.font = font
+        self.idx: dict[tuple[int, int, int, int], NameRecord] = {}
+
+    def __enter__(self):
+        self.idx = {
+            (r.nameID, r.platformID, r.platEncID, r.langID): r
+            for r in self.font["name"].names
+        }
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.font["name"].names = list(self.idx.values())
+
+    def set(self, id: int, name: str):
+        for key in ((id, 1, 0, 0x0), (id, 3, 1, 0x409)):
+            record = self.idx.get(key)
+            if record:
+                record.string = name
+            else:
+                self.idx[key] = makeName(name, *key)
+
+
 def joinPaths(*args: str) -> str:
     return "/".join(args)
 
@@ -73,6 +216,22 @@ def is_macos():
     return sys.platform == "darwin"
 
 
+def fast_copy(src: str, dst: str) -> str:
+    """
+    Hardlink ``src`` to ``dst`` if possible, fallback to copy.
+
+    The linked file shares data with ``src``, so never modify it in place
+    """
+    if not is_windows():
+        try:
+            link(src, dst)
+            return dst
+        except OSError:
+            pass
+    return shutil.copy2(src, dst)
+
+
+@lru_cache(maxsize=None)
 def get_font_forge_bin():
     WIN_FONTFORGE_PATH = "C:/Program Files (x86)/FontForgeBuilds/bin/fontforge.exe"
     MAC_FONTFORGE_PATH = (
@@ -101,11 +260,13 @@ def parse_github_mirror(github_mirror: str) -> str:
     return f"https://{github}"
 
 
-def download_file(url: str, target_path: str):
+def download_file(url: str, target_path: str, show_progress: bool = True):
     user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
     req = Request(url, headers={"User-Agent": user_agent})
-    not_ci = not is_ci()
-    with urlopen(req) as response, open(target_path, "wb") as out_file:
+    not_ci = show_progress and not is_ci()
+    # download to temp file, so that broken download will never be treated as complete
+    part_path = f"{target_path}.part"
+    with urlopen(req) as response, open(part_path, "wb") as out_file:
         total_size = int(response.getheader("Content-Length").strip())
         downloaded_size = 0
         block_size = 8192
@@ -124,11 +285,66 @@ def download_file(url: str, target_path: str):
                     f"Downloading: [{percent_downloaded:.2f}%] {downloaded_size} / {total_size}",
                     end="\r",
                 )
+    replace(part_path, target_path)
+
+
+__prefetch_threads: dict[str, Thread] = {}
+
+
+def prefetch_file(url: str, target_path: str, debug: bool = False):
+    """
+    Download file in background if not exists, `wait_prefetch` before using it
+    """
+    if path.exists(target_path) or target_path in __prefetch_threads:
+        return
+
+    def _download():
+        try:
+            download_file(url, target_path, show_progress=False)
+        except Exception as e:
+            # leave it to the foreground download, which reports the error
+            if debug:
+                print(f"❗ Fail to prefetch {url}: {e}")
+
+    print(f"Prefetch {url}")
+    thread = Thread(target=_download, daemon=True)
+    thread.start()
+    __prefetch_threads[target_path] = thread
+
+
+def wait_prefetch(target_path: str):
+    thread = __prefetch_threads.pop(target_path, None)
+    if thread:
+        thread.join()
+
+
+def extract_zip(zip_path: str, output_dir: str):
+    """
+    Extract members in parallel threads, zlib releases GIL while inflating
+    """
+    root = path.abspath(output_dir)
+    with ZipFile(zip_path, "r") as zip_ref:
+        members = [m for m in zip_ref.infolist() if not m.is_dir()]
+        parents = {
+            path.abspath(path.join(root, path.dirname(m.filename))) for m in members
+        }
+        if len(members) < 2 or any(
+            p != root and not p.startswith(root + path.sep) for p in parents
+        ):
+            zip_ref.extractall(output_dir)
+            return
+
+        # create directories first, so workers never race on makedirs
+        for parent in parents:
+            makedirs(parent, exist_ok=True)
+        with ThreadPoolExecutor() as executor:
+            list(executor.map(lambda m: zip_ref.extract(m, output_dir), members))
 
 
 def download_zip_and_extract(
     name: str, url: str, zip_path: str, output_dir: str, remove_zip: bool = False
 ) -> bool:
+    wait_prefetch(zip_path)
     if not path.exists(zip_path):
         print(f"{name} does not exist, download from {url}")
         try:
@@ -139,8 +355,7 @@ def download_zip_and_extract(
             )
             return False
     try:
-        with ZipFile(zip_path, "r") as zip_ref:
-            zip_ref.extractall(output_dir)
+        extract_zip(zip_path, output_dir)
         if remove_zip:
             remove(zip_path)
         return True
@@ -176,19 +391,36 @@ def check_font_patcher(
     return False
 
 
+def get_cn_base_font_url(
+    tag: str, zip_path: str, github_mirror: str = "github.com"
+) -> str:
+    return f"https://{github_mirror}/subframe7536/maple-font/releases/download/{tag}/{zip_path}"
+
+
 def download_cn_base_font(
     tag: str, zip_path: str, target_dir: str, github_mirror: str = "github.com"
 ) -> bool:
-    url = f"https://{github_mirror}/subframe7536/maple-font/releases/download/{tag}/{zip_path}"
     return download_zip_and_extract(
         name=f"{'Static' if 'static' in zip_path else 'Variable'} CN Base Font",
-        url=url,
+        url=get_cn_base_font_url(tag, zip_path, github_mirror),
         zip_path=zip_path,
         output_dir=target_dir,
     )
 
 
-def match_unicode_names(file_path: str) -> dict[str, str]:
+def match_unicode_names(file_path: str, cache_dir: str | None = None) -> dict[str, str]:
+    """
+    Map ``uniXXXX`` to glyph name from .glyphs file,
+    result is cached by file content if ``cache_dir`` is set
+    """
+    cache_path = None
+    if cache_dir:
+        digest = hash_file(file_path).hexdigest()
+        cache_path = joinPaths(cache_dir, f"unicode-names-{digest}.json")
+        if path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                return json_loads(f.read())
+
     font = GSFont(file_path)
     result = {}
 
@@ -200,6 +432,10 @@ def match_unicode_names(file_path: str) -> dict[str, str]:
             unicode_str = f"uni{''.join(unicode_values).upper().zfill(4)}"
             result[unicode_str] = glyph_name
 
+    if cache_path:
+        makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, "wb") as f:
+            f.write(json_dumps(result))
     return result
 
 
@@ -208,11 +444,12 @@ def verify_glyph_width(
     font: TTFont, expect_widths: list[int], file_name: str | None = None
 ):
     print("Verify glyph width")
-    result = []
-    for name in font.getGlyphNames():
-        width, _ = font["hmtx"][name]
-        if width not in expect_widths:
-            result.append([name, width])
+    valid_widths = set(expect_widths)
+    result = sorted(
+        (name, width)
+        for name, (width, _) in font["hmtx"].metrics.items()
+        if width not in valid_widths
+    )
 
     if result.__len__() > 0:
         print(f"Every glyph's width should be in {expect_widths}, but these are not:")
@@ -224,12 +461,83 @@ def verify_glyph_width(
         )
 
 
+class _BrotliWithQuality:
+    def __init__(self, brotli, quality: int):
+        self.brotli = brotli
+        self.quality = quality
+
+    def compress(self, data, **kwargs):
+        return self.brotli.compress(data, quality=self.quality, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.brotli, name)
+
+
+def convert_to_woff2(ttf_path: str, output_dir: str, quality: int = 11) -> str:
+    """
+    Convert TTF to WOFF2, brotli ``quality`` is 0-11, lower is faster but larger
+    """
+    from fontTools.ttLib import woff2
+
+    makedirs(output_dir, exist_ok=True)
+    target_path = joinPaths(output_dir, path.basename(ttf_path)[:-4] + ".woff2")
+    font = TTFont(ttf_path, recalcTimestamp=False)
+    font.flavor = "woff2"
+
+    # fontTools always compress with the max quality, there is no option for it
+    brotli = woff2.brotli
+    if quality != 11:
+        woff2.brotli = _BrotliWithQuality(brotli, quality)
+    try:
+        font.save(target_path, reorderTables=False)
+    finally:
+        woff2.brotli = brotli
+        font.close()
+    return target_path
+
+
+def hash_file(file_path: str, hasher=None):
+    """
+    Feed file content into ``hasher`` (new SHA-256 by default) and return it
+    """
+    if hasher is None:
+        hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        # empty file can not be mapped
+        if fstat(f.fileno()).st_size == 0:
+            return hasher
+        # map file into memory and hash pages in place, without copying into a read buffer
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            hasher.update(mm)
+    return hasher
+
+
+def scan_files(dir_path: str) -> list[DirEntry]:
+    """
+    Recursively list files in directory, in the same order as ``sorted(walk(dir_path))``
+    """
+    result: list[tuple[str, DirEntry]] = []
+    dirs = [dir_path]
+    while dirs:
+        parent = dirs.pop()
+        with scandir(parent) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    result.append((parent, entry))
+                elif not entry.is_symlink():
+                    dirs.append(entry.path)
+    result.sort(key=lambda item: (item[0], item[1].name))
+    return [entry for _, entry in result]
+
+
 def compress_folder(
     source_file_or_dir_path: str,
     target_parent_dir_path: str,
     family_name_compact: str,
     suffix: str,
-    build_config_path: str,
+    build_config: bytes,
 ) -> tuple[str, str]:
     """
     Archive folder and return sha1 and file name
@@ -244,72 +552,81 @@ def compress_folder(
     )
 
     with ZipFile(zip_path, "w", compression=ZIP_DEFLATED, compresslevel=5) as zip_file:
-        for root, _, files in walk(source_file_or_dir_path):
-            for file in files:
-                file_path = joinPaths(root, file)
-                zip_file.write(
-                    file_path, path.relpath(file_path, source_file_or_dir_path)
-                )
-        zip_file.write("OFL.txt", "LICENSE.txt")
-        if not source_file_or_dir_path.endswith("Variable"):
+        for entry in scan_files(source_file_or_dir_path):
             zip_file.write(
-                build_config_path,
-                "config.json",
+                entry.path, path.relpath(entry.path, source_file_or_dir_path)
             )
+        zip_file.write("OFL.txt", "LICENSE.txt")
+        if not source_file_or_dir_path.endswith("Variable"):
+            zip_file.writestr("config.json", build_config)
 
     zip_file.close()
-    sha256 = hashlib.sha256()
-    with open(zip_path, "rb") as zip_file:
-        while True:
-            data = zip_file.read(1024)
-            if not data:
-                break
-            sha256.update(data)
+    return hash_file(zip_path).hexdigest(), zip_name_without_ext
+
+
+def get_directory_hash(dir_path: str) -> str:
+    hasher = hashlib.sha256()
+    for entry in scan_files(dir_path):
+        try:
+            hash_file(entry.path, hasher)
+        except (IOError, OSError) as e:
+            raise Exception(f"Error reading file: {entry.path} - {e}")
 
-    return sha256.hexdigest(), zip_name_without_ext
+    return hasher.hexdigest()
+
+
+def get_directory_stat(dir_path: str) -> str:
+    """
+    Fingerprint of files' path, size and mtime, without reading their content
+    """
+    result = []
+    for entry in scan_files(dir_path):
+        st = entry.stat()
+        result.append(f"{entry.path}:{st.st_size}:{st.st_mtime_ns}")
+    return "\n".join(result)
 
 
 def check_directory_hash(dir_path: str) -> bool:
     if not path.exists(dir_path):
         print(f"{dir_path} not exist, skip computing hash")
         return False
-    hasher = hashlib.sha256()
-    for root, _, files in sorted(walk(dir_path)):
-        for file in sorted(files):
-            file_path = path.join(root, file)
-            try:
-                with open(file_path, "rb") as f:
-                    while True:
-                        # 4KB chunk size
-                        chunk = f.read(4096)
-                        if not chunk:
-                            break
-                        hasher.update(chunk)
-
-            except (IOError, OSError) as e:
-                raise Exception(f"Error reading file: {file_path} - {e}")
-
-    hash = hasher.hexdigest()
+
     with open(f"{dir_path}.sha256", "r") as f:
-        return f.readline() == hash
+        expected_hash = f.readline()
+
+    # skip hashing if no file is touched since last matched check
+    stat_path = f"{dir_path}.stat"
+    fingerprint = f"{expected_hash}\n{get_directory_stat(dir_path)}"
+    if path.exists(stat_path):
+        with open(stat_path, "r") as f:
+            if f.read() == fingerprint:
+                return True
+
+    if get_directory_hash(dir_path) != expected_hash:
+        return False
+
+    with open(stat_path, "w") as f:
+        f.write(fingerprint)
+    return True
 
 
 def merge_ttfonts(base_font_path: str, extra_font_path: str) -> TTFont:
     """
-    Merge glyphs from ``source_font`` into ``base_font``, skipping duplicate glyph names.
+    Merge glyphs from ``extra_font`` into ``base_font``, skipping duplicate glyph names.
 
     ``fontTools.merge.Merger`` will erase the glyph names, so merge them manually
 
     Args:
-        base_font (TTFont): The base font to merge into
-        source_font (TTFont): The font to merge from
+        base_font_path (str): Path of the base font to merge into
+        extra_font_path (str): Path of the font to merge from
 
     Returns:
         TTFont: The modified base_font with merged glyphs
     """
     try:
         base_font = TTFont(base_font_path)
-        extra_font = TTFont(extra_font_path)
+        # extra font is read only, just decompile the tables touched below
+        extra_font = TTFont(extra_font_path, lazy=True)
         # Get glyph tables and orders
         base_glyf = base_font["glyf"]
         extra_glyf = extra_font["glyf"]
@@ -371,10 +688,21 @@ def merge_ttfonts(base_font_path: str, extra_font_path: str) -> TTFont:
         raise
 
 
+# Pickled feature file AST, keyed by (is_italic, is_cn)
+# Fonts of the same kind share glyph names, so the fea string only need to be
+# parsed once per process. The builder mutates the AST, so unpickle a fresh copy for each font
+__fea_ast_cache: dict[tuple[bool, bool], bytes] = {}
+
+
 def patch_fea_string(font: TTFont, is_italic: bool, is_cn: bool):
     fea_str = generate_fea_string(is_italic, is_cn)
+    key = (is_italic, is_cn)
     try:
-        addOpenTypeFeaturesFromString(font, fea_str)
+        if key not in __fea_ast_cache:
+            __fea_ast_cache[key] = pickle.dumps(
+                Parser(StringIO(fea_str), font.getReverseGlyphMap()).parse()
+            )
+        addOpenTypeFeatures(font, pickle.loads(__fea_ast_cache[key]))
     except Exception as e:
         p = path.realpath("./fonts/issue.fea")
         with open(p, "w+") as f:
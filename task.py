@@ -1,10 +1,25 @@
 #!/usr/bin/env python3
-import argparse
+import sys
 
-from source.py.utils import check_directory_hash
+
+def check_cn_static_hash():
+    from source.py.utils import check_directory_hash
+
+    print("Test only")
+    if check_directory_hash("./source/cn/static"):
+        print("Matched CN static font hash")
+    else:
+        print("Unmatched CN static font hash")
 
 
 def main():
+    # no task, skip building the parser
+    if len(sys.argv) == 1:
+        check_cn_static_hash()
+        return
+
+    import argparse
+
     parser = argparse.ArgumentParser(description="Task script for Maple Font")
 
     command = parser.add_subparsers(dest="command", help="Total tasks")
@@ -61,11 +76,7 @@ def main():
 
         page("./maple-font-page", "./fonts/Variable", args.commit)
     else:
-        print("Test only")
-        if check_directory_hash("./source/cn/static"):
-            print("Matched CN static font hash")
-        else:
-            print("Unmatched CN static font hash")
+        check_cn_static_hash()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+from source.py.cache import BuildCache
+
+
+def test_stage_round_trip(tmp_path):
+    src = tmp_path / "font.glyphs"
+    src.write_text("v1")
+    db_path = str(tmp_path / "build.db")
+
+    cache = BuildCache(db_path)
+    key = cache.compute_key([str(src)], {"debug": False})
+    assert not cache.is_fresh("base", key)
+    cache.update("base", key)
+    cache.close()
+
+    cache = BuildCache(db_path)
+    assert cache.compute_key([str(src)], {"debug": False}) == key
+    assert cache.is_fresh("base", key)
+
+    src.write_text("v2, changed")
+    changed_key = cache.compute_key([str(src)], {"debug": False})
+    assert changed_key != key
+    assert not cache.is_fresh("base", changed_key)
+    # stale record is evicted
+    assert not cache.is_fresh("base", key)
+    cache.close()
+
+
+def test_done_items_need_output(tmp_path):
+    cache = BuildCache(str(tmp_path / "build.db"))
+    regular = tmp_path / "MapleMono-NF-Regular.ttf"
+    bold = tmp_path / "MapleMono-NF-Bold.ttf"
+    regular.write_bytes(b"")
+    bold.write_bytes(b"")
+    cache.mark_done("nf", "key", "MapleMono-Regular.ttf", str(regular))
+    cache.mark_done("nf", "key", "MapleMono-Bold.ttf", str(bold))
+
+    assert cache.get_done_items("nf", "key") == {
+        "MapleMono-Regular.ttf",
+        "MapleMono-Bold.ttf",
+    }
+    assert cache.get_done_items("nf", "other-key") == set()
+
+    bold.unlink()
+    assert cache.get_done_items("nf", "key") == {"MapleMono-Regular.ttf"}
+
+    cache.clear_stages()
+    assert cache.get_done_items("nf", "key") == set()
+    cache.close()
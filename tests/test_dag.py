@@ -0,0 +1,39 @@
+from functools import partial
+
+import pytest
+
+from source.py.dag import Node, run_dag
+
+
+def test_run_dag_order():
+    order = []
+    nodes = [
+        Node("format", partial(order.append, "format"), deps=["base"]),
+        Node("nf", partial(order.append, "nf"), deps=["base"]),
+        Node("base", partial(order.append, "base"), deps=["variable"]),
+        Node("variable", partial(order.append, "variable")),
+        Node("zip", partial(order.append, "zip"), deps=["format", "nf"]),
+    ]
+    run_dag(1, nodes)
+
+    assert sorted(order) == sorted(node.key for node in nodes)
+    for node in nodes:
+        for dep in node.deps:
+            assert order.index(dep) < order.index(node.key)
+
+
+def test_run_dag_circular():
+    order = []
+    nodes = [
+        Node("a", partial(order.append, "a"), deps=["b"]),
+        Node("b", partial(order.append, "b"), deps=["a"]),
+        Node("c", partial(order.append, "c")),
+    ]
+    with pytest.raises(ValueError, match="Circular"):
+        run_dag(1, nodes)
+    assert order == ["c"]
+
+
+def test_run_dag_unknown_dep():
+    with pytest.raises(ValueError, match="Unknown dependency"):
+        run_dag(1, [Node("a", lambda: None, deps=["missing"])])